@@ -10,6 +10,7 @@ MQTT_BROKER = "192.168.1.100"  # Replace with your Raspberry Pi 5 IP address
 MQTT_PORT = 1883
 MQTT_USER = ""  # Leave empty if no authentication
 MQTT_PASSWORD = ""  # Leave empty if no authentication
+MQTT_KEEPALIVE = 60  # Seconds; the broker drops the connection after 1.5x this without traffic
 
 # Device Configuration
 ROOM_NUMBER = "1"  # Change this for different rooms (1, 2, 3, etc.)
@@ -17,6 +18,7 @@ DEVICE_NAME = "pico-sht30-room1"  # Unique device identifier
 
 # Sensor Configuration
 READING_INTERVAL = 5  # Seconds between readings
+TEMP_UNIT = "F"  # Unit for published temperatures: "F" or "C"
 I2C_SDA_PIN = 4  # GPIO pin for I2C SDA
 I2C_SCL_PIN = 5  # GPIO pin for I2C SCL
 
@@ -31,13 +33,27 @@ LIGHT_SENSOR_PIN = 28  # GPIO pin for photo transistor (ADC2, default GP28)
 LIGHT_ENABLED = True  # Set to False to disable light sensor
 LIGHT_THRESHOLD_LOW = 10  # Percentage below which it's considered dark (0-100)
 LIGHT_THRESHOLD_HIGH = 80  # Percentage above which it's considered bright (0-100)
-LIGHT_READING_INTERVAL = 10  # Seconds between light level readings
+LIGHT_HYSTERESIS = 2  # Percentage a level must cross back over a threshold before the state changes
+
+# Publish Filtering
+# Readings are only published when they move by at least the deadband,
+# or when HEARTBEAT_INTERVAL seconds have passed since the last publish
+TEMP_DEADBAND = 0.2  # Degrees
+HUM_DEADBAND = 0.5  # Percent relative humidity
+LIGHT_DEADBAND = 2.0  # Percent light level
+HEARTBEAT_INTERVAL = 60  # Seconds
 
 # MQTT Topics (will be formatted with room number)
 TEMP_TOPIC_TEMPLATE = "room-temp/{room}"
 HUM_TOPIC_TEMPLATE = "room-hum/{room}"
 MOTION_TOPIC_TEMPLATE = "room-motion/{room}"
 LIGHT_TOPIC_TEMPLATE = "room-light/{room}"
+STATE_TOPIC_TEMPLATE = "room/{room}/state"  # Combined reading, used when LEGACY_TOPICS is False
+STATUS_TOPIC_TEMPLATE = "room-status/{room}"  # Retained {"online": true/false}, false is the MQTT last will
+
+# Set to False to publish all readings as one JSON document on the state topic
+# instead of one message per sensor (the Go services subscribe to the per-sensor topics)
+LEGACY_TOPICS = True
 
 # Advanced Settings
 MAX_WIFI_RETRIES = 30
@@ -2,7 +2,10 @@
 # Temperature and Humidity Monitoring with MQTT
 
 import machine
+import micropython
 import network
+import select
+import socket
 import time
 import ujson
 from machine import Pin, I2C
@@ -16,6 +19,23 @@ except ImportError:
     print("ERROR: config.py not found! Please copy config_template.py to config.py and configure it.")
     machine.reset()
 
+# Settings added to config_template.py after the first release; an older
+# config.py that lacks them falls back to the template defaults
+for _name, _default in (
+    ("MQTT_KEEPALIVE", 60),
+    ("TEMP_UNIT", "F"),
+    ("LIGHT_HYSTERESIS", 2),
+    ("TEMP_DEADBAND", 0.2),
+    ("HUM_DEADBAND", 0.5),
+    ("LIGHT_DEADBAND", 2.0),
+    ("HEARTBEAT_INTERVAL", 60),
+    ("STATE_TOPIC_TEMPLATE", "room/{room}/state"),
+    ("STATUS_TOPIC_TEMPLATE", "room-status/{room}"),
+    ("LEGACY_TOPICS", True),
+):
+    if _name not in globals():
+        globals()[_name] = _default
+
 # Import SHT-30 driver
 try:
     from sht30 import SHT30
@@ -28,6 +48,43 @@ TEMP_TOPIC = TEMP_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
 HUM_TOPIC = HUM_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
 MOTION_TOPIC = MOTION_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
 LIGHT_TOPIC = LIGHT_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
+STATE_TOPIC = STATE_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
+STATUS_TOPIC = STATUS_TOPIC_TEMPLATE.format(room=ROOM_NUMBER)
+
+# Encoded once so publishes don't re-encode the topic strings
+TEMP_TOPIC_B = TEMP_TOPIC.encode()
+HUM_TOPIC_B = HUM_TOPIC.encode()
+MOTION_TOPIC_B = MOTION_TOPIC.encode()
+LIGHT_TOPIC_B = LIGHT_TOPIC.encode()
+STATE_TOPIC_B = STATE_TOPIC.encode()
+STATUS_TOPIC_B = STATUS_TOPIC.encode()
+
+# Unit for published temperatures; the SHT-30 driver reports Celsius
+TEMP_IN_FAHRENHEIT = TEMP_UNIT.upper() == "F"
+TEMP_SYMBOL = "°F" if TEMP_IN_FAHRENHEIT else "°C"
+
+# Raw SHT-30 words straight to published units, so each reading costs one
+# multiply-add: T(C) = raw * 175 / 65535 - 45, T(F) = T(C) * 1.8 + 32
+if TEMP_IN_FAHRENHEIT:
+    _TEMP_SCALE = 175.0 * 1.8 / 65535.0
+    _TEMP_OFFSET = -45.0 * 1.8 + 32.0
+else:
+    _TEMP_SCALE = 175.0 / 65535.0
+    _TEMP_OFFSET = -45.0
+_HUM_SCALE = 100.0 / 65535.0
+
+# Pre-serialized static part of each JSON payload; only the readings and
+# timestamp are formatted per publish
+_ROOM_JSON = ujson.dumps(ROOM_NUMBER)
+_DEVICE_JSON = ujson.dumps(DEVICE_NAME)
+TEMP_PREFIX = ('{"unit":"%s","room":%s,"sensor":"SHT-30","device_id":%s,"temperature":'
+               % (TEMP_SYMBOL, _ROOM_JSON, _DEVICE_JSON)).encode()
+HUM_PREFIX = ('{"unit":"%%","room":%s,"sensor":"SHT-30","device_id":%s,"humidity":'
+              % (_ROOM_JSON, _DEVICE_JSON)).encode()
+MOTION_PREFIX = ('{"room":%s,"sensor":"PIR","device_id":%s,"motion":'
+                 % (_ROOM_JSON, _DEVICE_JSON)).encode()
+LIGHT_PREFIX = ('{"unit":"%%","room":%s,"sensor":"PhotoTransistor","device_id":%s,"light_level":'
+                % (_ROOM_JSON, _DEVICE_JSON)).encode()
 
 # LED for status indication
 led = Pin("LED", Pin.OUT)
@@ -45,49 +102,92 @@ if LIGHT_ENABLED:
     light_sensor = ADC(Pin(LIGHT_SENSOR_PIN))
     print(f"Light sensor enabled on GPIO {LIGHT_SENSOR_PIN} (ADC)")
 
-# Motion detection state
-motion_detected = False
-last_motion_time = 0
-motion_state_sent = False
+class _State:
+    """Mutable sensor state shared between the main loop, helpers and the PIR interrupt"""
+    __slots__ = ('motion_detected', 'last_motion_time', 'motion_state_sent',
+                 'pir_level', 'pir_edge', 'light_level_percent', 'last_light_state')
+    
+    def __init__(self):
+        # Motion detection state
+        self.motion_detected = False
+        self.last_motion_time = 0
+        self.motion_state_sent = False
+        
+        # PIR level latched by the pin interrupt handler
+        self.pir_level = 0
+        self.pir_edge = False
+        
+        # Light sensor state
+        self.light_level_percent = 0
+        self.last_light_state = "unknown"  # "dark", "normal", "bright"
+
+state = _State()
 
-# Light sensor state
-light_level_percent = 0
-last_light_reading = 0
-last_light_state = "unknown"  # "dark", "normal", "bright"
+# Last published value and time per metric ('t', 'h', 'l'), for deadband filtering
+_last_pub = {}
+# Readings queued this cycle; they only count as published once flush() succeeds
+_pending_pub = {}
 
-class SHT30:
-    """SHT-30 Temperature and Humidity Sensor Driver"""
+class BatchMQTTClient(MQTTClient):
+    """MQTT client that queues QoS 0 publishes and sends them in a single socket write"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._out = bytearray()
+        self.last_tx = 0  # time.time() of the last packet sent to the broker
     
-    def __init__(self, i2c, addr=0x44):
-        self.i2c = i2c
-        self.addr = addr
+    def connect(self, *args, **kwargs):
+        result = super().connect(*args, **kwargs)
+        self.last_tx = time.time()
+        return result
+    
+    def publish(self, *args, **kwargs):
+        super().publish(*args, **kwargs)
+        self.last_tx = time.time()
+    
+    def publish_buf(self, topic, msg, retain=False):
+        """Queue a QoS 0 PUBLISH packet until the next flush()"""
+        out = self._out
+        out.append(0x31 if retain else 0x30)
         
-    def read_data(self):
-        """Read temperature and humidity from SHT-30"""
-        try:
-            # Send measurement command (high repeatability)
-            self.i2c.writeto(self.addr, b'\x2C\x06')
-            time.sleep_ms(500)  # Wait for measurement
-            
-            # Read 6 bytes of data
-            data = self.i2c.readfrom(self.addr, 6)
-            
-            # Convert temperature (first 3 bytes)
-            temp_raw = (data[0] << 8) | data[1]
-            temperature_celsius = -45 + (175 * temp_raw / 65535.0)
-            
-            # Convert to Fahrenheit
-            temperature = (temperature_celsius * 9.0 / 5.0) + 32.0
-            
-            # Convert humidity (last 3 bytes)
-            hum_raw = (data[3] << 8) | data[4]
-            humidity = 100 * hum_raw / 65535.0
-            
-            return temperature, humidity
-            
-        except Exception as e:
-            print(f"Error reading SHT-30: {e}")
-            return None, None
+        # Remaining length, variable-length encoded
+        size = 2 + len(topic) + len(msg)
+        while size > 0x7F:
+            out.append((size & 0x7F) | 0x80)
+            size >>= 7
+        out.append(size)
+        
+        out.append(len(topic) >> 8)
+        out.append(len(topic) & 0xFF)
+        out.extend(topic)
+        out.extend(msg)
+    
+    def flush(self):
+        """Write all queued publishes to the broker, returning the bytes sent"""
+        if not self._out:
+            return 0
+        out = self._out
+        self._out = bytearray()
+        self.sock.write(out)
+        self.last_tx = time.time()
+        return len(out)
+    
+    def ping_due_in(self, now):
+        """Seconds until a PINGREQ is needed to hold the keepalive (inf if disabled)"""
+        if not self.keepalive:
+            return float('inf')
+        return self.keepalive // 2 - (now - self.last_tx)
+    
+    def keep_alive(self, now):
+        """Send a PINGREQ if nothing has gone out for half the keepalive period;
+        umqtt.simple never pings on its own"""
+        if self.ping_due_in(now) <= 0:
+            self.ping()
+            self.last_tx = now
+    
+    def discard(self):
+        """Drop queued publishes that were not sent"""
+        self._out = bytearray()
 
 def connect_wifi():
     """Connect to WiFi network"""
@@ -119,51 +219,69 @@ def connect_mqtt():
     """Connect to MQTT broker"""
     try:
         if MQTT_USER and MQTT_PASSWORD:
-            client = MQTTClient(DEVICE_NAME, MQTT_BROKER, port=MQTT_PORT, 
-                              user=MQTT_USER, password=MQTT_PASSWORD)
+            client = BatchMQTTClient(DEVICE_NAME, MQTT_BROKER, port=MQTT_PORT, 
+                                     user=MQTT_USER, password=MQTT_PASSWORD,
+                                     keepalive=MQTT_KEEPALIVE)
         else:
-            client = MQTTClient(DEVICE_NAME, MQTT_BROKER, port=MQTT_PORT)
-            
+            client = BatchMQTTClient(DEVICE_NAME, MQTT_BROKER, port=MQTT_PORT,
+                                     keepalive=MQTT_KEEPALIVE)
+        
+        # The broker publishes the last will if the connection drops without a disconnect
+        client.set_last_will(STATUS_TOPIC_B, b'{"online":false}', retain=True, qos=1)
         client.connect()
+        client.publish(STATUS_TOPIC_B, b'{"online":true}', retain=True, qos=1)
+        
+        # Disable Nagle so back-to-back small publishes aren't held for the delayed ACK
+        try:
+            client.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass  # Not supported by this port's socket module
+        
         print(f"MQTT connected to {MQTT_BROKER}:{MQTT_PORT}")
         return client
     except Exception as e:
         print(f"MQTT connection failed: {e}")
         return None
 
-def publish_sensor_data(client, temperature, humidity):
-    """Publish temperature and humidity to MQTT topics"""
+def _should_publish(key, value, deadband, now):
+    """Check if a reading moved outside its deadband or is due for a heartbeat publish"""
+    last = _last_pub.get(key)
+    if last is None:
+        return True
+    return abs(value - last[0]) >= deadband or now - last[1] >= HEARTBEAT_INTERVAL
+
+def _mark_published(key, value, now):
+    """Record a queued reading; it takes effect on _commit_published()"""
+    _pending_pub[key] = (value, now)
+
+def _commit_published():
+    """Apply the readings queued this cycle once they have been sent"""
+    _last_pub.update(_pending_pub)
+    _pending_pub.clear()
+
+def _discard_published(client):
+    """Forget this cycle's queued readings and packets after a failed send"""
+    _pending_pub.clear()
+    client.discard()
+
+def publish_sensor_data(client, temperature, humidity, timestamp):
+    """Publish temperature and humidity to MQTT topics when they have changed"""
     try:
-        # Create JSON payloads with timestamp
-        timestamp = time.time()
-        
-        temp_payload = ujson.dumps({
-            "temperature": round(temperature, 2),
-            "unit": "°F",
-            "room": ROOM_NUMBER,
-            "sensor": "SHT-30",
-            "timestamp": timestamp,
-            "device_id": DEVICE_NAME
-        })
-        
-        hum_payload = ujson.dumps({
-            "humidity": round(humidity, 2),
-            "unit": "%",
-            "room": ROOM_NUMBER,
-            "sensor": "SHT-30", 
-            "timestamp": timestamp,
-            "device_id": DEVICE_NAME
-        })
-        
-        # Publish temperature
-        client.publish(TEMP_TOPIC, temp_payload)
-        if ENABLE_DETAILED_LOGGING:
-            print(f"Published temp: {temperature:.2f}°C to {TEMP_TOPIC}")
+        # Publish temperature (QoS 0 telemetry, retained for new subscribers)
+        if _should_publish('t', temperature, TEMP_DEADBAND, timestamp):
+            temp_payload = TEMP_PREFIX + b'%.2f,"timestamp":%d}' % (temperature, timestamp)
+            client.publish_buf(TEMP_TOPIC_B, temp_payload, retain=True)
+            _mark_published('t', temperature, timestamp)
+            if ENABLE_DETAILED_LOGGING:
+                print(f"Queued temp: {temperature:.2f}{TEMP_SYMBOL} for {TEMP_TOPIC}")
         
         # Publish humidity
-        client.publish(HUM_TOPIC, hum_payload)
-        if ENABLE_DETAILED_LOGGING:
-            print(f"Published humidity: {humidity:.2f}% to {HUM_TOPIC}")
+        if _should_publish('h', humidity, HUM_DEADBAND, timestamp):
+            hum_payload = HUM_PREFIX + b'%.2f,"timestamp":%d}' % (humidity, timestamp)
+            client.publish_buf(HUM_TOPIC_B, hum_payload, retain=True)
+            _mark_published('h', humidity, timestamp)
+            if ENABLE_DETAILED_LOGGING:
+                print(f"Queued humidity: {humidity:.2f}% for {HUM_TOPIC}")
         
         return True
         
@@ -171,22 +289,16 @@ def publish_sensor_data(client, temperature, humidity):
         print(f"Failed to publish data: {e}")
         return False
 
-def publish_motion_event(client, motion_detected, motion_start_time=None):
+def publish_motion_event(client, motion_detected, timestamp, motion_start_time=None):
     """Publish motion detection event to MQTT topic"""
     try:
-        timestamp = time.time()
-        
-        motion_payload = ujson.dumps({
-            "motion": motion_detected,
-            "room": ROOM_NUMBER,
-            "sensor": "PIR",
-            "timestamp": timestamp,
-            "motion_start": motion_start_time if motion_start_time else timestamp,
-            "device_id": DEVICE_NAME
-        })
+        motion_payload = MOTION_PREFIX + b'%s,"timestamp":%d,"motion_start":%d}' % (
+            b'true' if motion_detected else b'false',
+            timestamp,
+            motion_start_time if motion_start_time else timestamp)
         
-        # Publish motion event
-        client.publish(MOTION_TOPIC, motion_payload)
+        # Publish motion event (QoS 1, losing an edge leaves consumers in the wrong state)
+        client.publish(MOTION_TOPIC_B, motion_payload, qos=1)
         if ENABLE_DETAILED_LOGGING:
             status = "DETECTED" if motion_detected else "CLEARED"
             print(f"Published motion {status} to {MOTION_TOPIC}")
@@ -197,41 +309,79 @@ def publish_motion_event(client, motion_detected, motion_start_time=None):
         print(f"Failed to publish motion data: {e}")
         return False
 
-def check_motion_sensor():
-    """Check PIR sensor and return motion state"""
-    global motion_detected, last_motion_time, motion_state_sent
+def _pir_isr(pin):
+    """PIR pin interrupt handler: latch the new level for the main loop"""
+    state.pir_level = pin.value()
+    state.pir_edge = True
+
+# Longest single lightsleep while the PIR is enabled. A timed lightsleep is
+# not guaranteed to wake on (or latch) GPIO edges, so the pin is re-read
+# between slices; this bounds motion latency like the old 100 ms poll did
+PIR_SLEEP_SLICE_MS = 100
+
+def sleep_until_motion(ms):
+    """lightsleep for up to ms, returning early once the PIR level changes"""
+    if not PIR_ENABLED or not pir_sensor:
+        machine.lightsleep(ms)
+        return
     
+    deadline = time.ticks_add(time.ticks_ms(), ms)
+    while not state.pir_edge:
+        remaining = time.ticks_diff(deadline, time.ticks_ms())
+        if remaining <= 0:
+            return
+        machine.lightsleep(min(remaining, PIR_SLEEP_SLICE_MS))
+        
+        # Catch edges the interrupt missed while the chip was asleep
+        level = pir_sensor.value()
+        if level != state.pir_level:
+            state.pir_level = level
+            state.pir_edge = True
+
+@micropython.native
+def check_motion_sensor(current_time):
+    """Update motion state from the latched PIR level and return it"""
     if not PIR_ENABLED or not pir_sensor:
         return False
     
-    current_time = time.time()
-    pir_reading = pir_sensor.value()
+    pir_reading = state.pir_level
+    edge = state.pir_edge
+    state.pir_edge = False
     
     # Motion detected
     if pir_reading == 1:
-        if not motion_detected:
+        if not state.motion_detected:
             # New motion detected
-            motion_detected = True
-            last_motion_time = current_time
-            motion_state_sent = False
+            state.motion_detected = True
+            state.last_motion_time = current_time
             if ENABLE_DETAILED_LOGGING:
                 print(f"Motion detected in room {ROOM_NUMBER}")
         else:
             # Motion still ongoing, update last seen time
-            last_motion_time = current_time
+            state.last_motion_time = current_time
         return True
     
     # No motion currently detected
     else:
-        if motion_detected:
+        if state.motion_detected:
+            if edge:
+                # Motion just stopped; the timeout runs from the falling edge
+                state.last_motion_time = current_time
             # Check if motion timeout has elapsed
-            if current_time - last_motion_time >= PIR_TIMEOUT:
-                motion_detected = False
-                motion_state_sent = False
+            elif current_time - state.last_motion_time >= PIR_TIMEOUT:
+                state.motion_detected = False
                 if ENABLE_DETAILED_LOGGING:
                     print(f"Motion cleared in room {ROOM_NUMBER}")
                 return False
-        return motion_detected  # Still in timeout period
+        return state.motion_detected  # Still in timeout period
+
+@micropython.viper
+def _avg_adc(adc) -> int:
+    """Average 16 ADC samples to smooth out photo transistor noise"""
+    total = 0
+    for _ in range(16):
+        total += int(adc.read_u16())
+    return total >> 4
 
 def read_light_sensor():
     """Read photo transistor and return light level percentage"""
@@ -239,8 +389,8 @@ def read_light_sensor():
         return None
     
     try:
-        # Read ADC value (0-65535 on Pico)
-        adc_value = light_sensor.read_u16()
+        # Read averaged ADC value (0-65535 on Pico)
+        adc_value = _avg_adc(light_sensor)
         
         # Convert to percentage (0-100%)
         # Higher ADC value = more light (assuming photo transistor pulls voltage high with light)
@@ -252,42 +402,77 @@ def read_light_sensor():
         print(f"Error reading light sensor: {e}")
         return None
 
-def publish_light_data(client, light_level, light_state):
+def publish_light_data(client, light_level, light_state, timestamp):
     """Publish light level data to MQTT topic"""
     try:
-        timestamp = time.time()
+        # light_state is one of "dark", "normal", "bright"
+        light_payload = LIGHT_PREFIX + b'%.1f,"light_percent":%.1f,"light_state":"%s","timestamp":%d}' % (
+            light_level, light_level, light_state.encode(), timestamp)
+        
+        # Publish light data
+        client.publish_buf(LIGHT_TOPIC_B, light_payload, retain=True)
+        if ENABLE_DETAILED_LOGGING:
+            print(f"Queued light: {light_level:.1f}% ({light_state}) for {LIGHT_TOPIC}")
         
-        light_payload = ujson.dumps({
-            "light_level": round(light_level, 1),
-            "light_percent": round(light_level, 1),
-            "light_state": light_state,  # "dark", "normal", "bright"
-            "unit": "%",
+        return True
+        
+    except Exception as e:
+        print(f"Failed to publish light data: {e}")
+        return False
+
+def publish_state(client, temperature, humidity, motion, light_level, light_state, timestamp, qos=0):
+    """Publish all current readings as a single JSON document to the room state topic"""
+    try:
+        reading = {
+            "unit": TEMP_SYMBOL,
             "room": ROOM_NUMBER,
-            "sensor": "PhotoTransistor",
             "timestamp": timestamp,
             "device_id": DEVICE_NAME
-        })
+        }
+        if temperature is not None:
+            reading["temperature"] = round(temperature, 2)
+            reading["humidity"] = round(humidity, 2)
+        if PIR_ENABLED:
+            reading["motion"] = motion
+        if LIGHT_ENABLED and light_level is not None:
+            reading["light_level"] = round(light_level, 1)
+            reading["light_state"] = light_state
         
-        # Publish light data
-        client.publish(LIGHT_TOPIC, light_payload)
-        if ENABLE_DETAILED_LOGGING:
-            print(f"Published light: {light_level:.1f}% ({light_state}) to {LIGHT_TOPIC}")
+        # Publish combined state (retained so new subscribers get the latest reading)
+        payload = ujson.dumps(reading).encode()
+        if qos:
+            client.publish(STATE_TOPIC_B, payload, retain=True, qos=qos)
+            if ENABLE_DETAILED_LOGGING:
+                print(f"Published state to {STATE_TOPIC}")
+        else:
+            client.publish_buf(STATE_TOPIC_B, payload, retain=True)
+            if ENABLE_DETAILED_LOGGING:
+                print(f"Queued state for {STATE_TOPIC}")
         
         return True
         
     except Exception as e:
-        print(f"Failed to publish light data: {e}")
+        print(f"Failed to publish state: {e}")
         return False
 
-def determine_light_state(light_percent):
-    """Determine light state based on percentage thresholds"""
-    if light_percent < LIGHT_THRESHOLD_LOW:
+@micropython.native
+def determine_light_state(light_percent, previous_state="unknown"):
+    """Determine light state based on percentage thresholds, with hysteresis around the previous state"""
+    low = LIGHT_THRESHOLD_LOW
+    high = LIGHT_THRESHOLD_HIGH
+    if previous_state == "dark":
+        low += LIGHT_HYSTERESIS
+    elif previous_state == "bright":
+        high -= LIGHT_HYSTERESIS
+    
+    if light_percent < low:
         return "dark"
-    elif light_percent > LIGHT_THRESHOLD_HIGH:
+    elif light_percent > high:
         return "bright"
     else:
         return "normal"
 
+@micropython.native
 def blink_led(times=1, delay=0.1):
     """Blink LED for status indication"""
     for _ in range(times):
@@ -306,6 +491,8 @@ def main():
         print(f"Motion Topic: {MOTION_TOPIC}")
     if LIGHT_ENABLED:
         print(f"Light Topic: {LIGHT_TOPIC}")
+    if not LEGACY_TOPICS:
+        print(f"State Topic: {STATE_TOPIC}")
     
     # Initialize I2C
     try:
@@ -320,7 +507,7 @@ def main():
         print(f"I2C initialization failed: {e}")
         return
     
-    # Initialize SHT-30 sensor using the new driver
+    # Initialize SHT-30 sensor
     try:
         sensor = SHT30(i2c)
         print("SHT-30 sensor initialized successfully")
@@ -349,57 +536,109 @@ def main():
     # Main sensor loop
     error_count = 0
     last_sensor_reading = 0
+    loop_count = 0
+    
+    # Watch the MQTT socket so broker traffic and disconnects are noticed between readings
+    poller = select.poll()
+    poller.register(mqtt_client.sock, select.POLLIN)
+    
+    # Motion is edge-driven: the interrupt latches the PIR level, and the sleep
+    # re-reads the pin between slices in case the interrupt missed an edge
+    if PIR_ENABLED:
+        state.pir_level = pir_sensor.value()
+        state.pir_edge = True  # Evaluate the boot level once, motion may already be active
+        pir_sensor.irq(trigger=Pin.IRQ_RISING | Pin.IRQ_FALLING, handler=_pir_isr)
+    temperature = humidity = None
+    light_level = None
+    current_light_state = "unknown"
     
     while True:
         try:
             current_time = time.time()
             
-            # Check motion sensor (check every loop iteration)
-            if PIR_ENABLED:
-                motion_state = check_motion_sensor()
+            # Handle PIR edges, pending motion timeouts and unsent motion changes
+            if PIR_ENABLED and (state.pir_edge or state.motion_detected or state.motion_state_sent):
+                motion_state = check_motion_sensor(current_time)
                 
-                # Send motion state change if needed
-                if motion_state != motion_state_sent:
-                    if publish_motion_event(mqtt_client, motion_state, last_motion_time):
-                        motion_state_sent = motion_state
+                # Send motion state change if needed; motion_state_sent only
+                # advances once the QoS 1 publish is acknowledged, so a failed
+                # publish is retried on the next pass
+                if motion_state != state.motion_state_sent:
+                    if LEGACY_TOPICS:
+                        sent = publish_motion_event(mqtt_client, motion_state, current_time, state.last_motion_time)
+                    else:
+                        sent = publish_state(mqtt_client, temperature, humidity, motion_state,
+                                             light_level, current_light_state, current_time, qos=1)
+                    if sent:
+                        state.motion_state_sent = motion_state
                         if motion_state:
                             blink_led(2, 0.05)  # Quick double blink for motion
             
             # Read temperature/humidity sensors at configured interval
             if current_time - last_sensor_reading >= READING_INTERVAL:
-                temperature, humidity = sensor.read_temperature_humidity()
+                temp_raw, hum_raw = sensor.measure_raw('high')
+                temperature = temp_raw * _TEMP_SCALE + _TEMP_OFFSET
+                humidity = min(100.0, hum_raw * _HUM_SCALE)
                 
                 # Read light sensor data
                 light_level = None
                 current_light_state = "unknown"
+                pending_light_state = None
                 if LIGHT_ENABLED:
                     light_level = read_light_sensor()
                     if light_level is not None:
-                        current_light_state = determine_light_state(light_level)
+                        current_light_state = determine_light_state(light_level, state.last_light_state)
+                        state.light_level_percent = light_level
                         
-                        # Update global state
-                        global light_level_percent, last_light_state
-                        light_level_percent = light_level
-                        
-                        # Publish light data if state changed or it's been a while
-                        if (current_light_state != last_light_state or 
-                            current_time - last_light_reading >= LIGHT_READING_INTERVAL):
-                            if publish_light_data(mqtt_client, light_level, current_light_state):
-                                last_light_state = current_light_state
-                                global last_light_reading
-                                last_light_reading = current_time
+                        # Publish light data if state changed or the level moved outside the deadband
+                        if LEGACY_TOPICS and (current_light_state != state.last_light_state or 
+                            _should_publish('l', light_level, LIGHT_DEADBAND, current_time)):
+                            if publish_light_data(mqtt_client, light_level, current_light_state, current_time):
+                                pending_light_state = current_light_state
+                                _mark_published('l', light_level, current_time)
                 
                 if ENABLE_DETAILED_LOGGING:
-                    motion_status = " [MOTION]" if (PIR_ENABLED and motion_detected) else ""
+                    motion_status = " [MOTION]" if (PIR_ENABLED and state.motion_detected) else ""
                     light_status = f" [LIGHT:{current_light_state.upper()}:{light_level:.1f}%]" if LIGHT_ENABLED and light_level is not None else ""
-                    print(f"Room {ROOM_NUMBER} - Temp: {temperature:.2f}°F, Humidity: {humidity:.2f}%{motion_status}{light_status}")
-                else:
-                    motion_indicator = "M" if (PIR_ENABLED and motion_detected) else " "
-                    light_indicator = f"L:{light_level:.0f}%" if LIGHT_ENABLED and light_level is not None else ""
-                    print(f"T:{temperature:.1f}°F H:{humidity:.1f}% {motion_indicator} {light_indicator}")
+                    print(f"Room {ROOM_NUMBER} - Temp: {temperature:.2f}{TEMP_SYMBOL}, Humidity: {humidity:.2f}%{motion_status}{light_status}")
                 
                 # Publish temperature/humidity to MQTT
-                if publish_sensor_data(mqtt_client, temperature, humidity):
+                if LEGACY_TOPICS:
+                    published = publish_sensor_data(mqtt_client, temperature, humidity, current_time)
+                elif (_should_publish('t', temperature, TEMP_DEADBAND, current_time) or
+                      _should_publish('h', humidity, HUM_DEADBAND, current_time) or
+                      (light_level is not None and
+                       (current_light_state != state.last_light_state or
+                        _should_publish('l', light_level, LIGHT_DEADBAND, current_time)))):
+                    published = publish_state(mqtt_client, temperature, humidity, state.motion_detected,
+                                              light_level, current_light_state, current_time)
+                    if published:
+                        _mark_published('t', temperature, current_time)
+                        _mark_published('h', humidity, current_time)
+                        if light_level is not None:
+                            _mark_published('l', light_level, current_time)
+                            pending_light_state = current_light_state
+                else:
+                    published = True  # Nothing changed, skip the publish
+                
+                # Send everything queued this cycle in one socket write; the
+                # deadband state only advances once the broker has the data
+                if published:
+                    try:
+                        sent_bytes = mqtt_client.flush()
+                    except OSError as e:
+                        print(f"Failed to publish data: {e}")
+                        published = False
+                if published:
+                    _commit_published()
+                    if ENABLE_DETAILED_LOGGING and sent_bytes:
+                        print(f"Published queued readings ({sent_bytes} bytes)")
+                    if pending_light_state is not None:
+                        state.last_light_state = pending_light_state
+                else:
+                    _discard_published(mqtt_client)
+                
+                if published:
                     blink_led(1, 0.1)  # Short blink for success
                     error_count = 0  # Reset error count on success
                 else:
@@ -407,38 +646,43 @@ def main():
                     blink_led(3, 0.1)  # Triple blink for MQTT error
                 
                 last_sensor_reading = current_time
+                
+                # Reclaim this cycle's payload buffers
+                gc.collect()
             
             # Check for too many consecutive errors
             if error_count >= MAX_CONSECUTIVE_ERRORS:
                 print(f"Too many consecutive errors ({error_count}), restarting...")
                 machine.reset()
             
-            # Garbage collection
-            gc.collect()
+            # Periodic garbage collection for motion-only iterations
+            loop_count += 1
+            if loop_count % 50 == 0:
+                gc.collect()
             
-            # Short sleep to prevent busy waiting
-            time.sleep(0.1)
+            # Service anything the broker sent (PINGRESP, disconnect) before sleeping
+            if poller.poll(0):
+                mqtt_client.check_msg()
+            # Re-read the clock so time spent reading, publishing and
+            # collecting this pass comes off the sleep instead of adding drift
+            now = time.time()
+            mqtt_client.keep_alive(now)
             
-        except KeyboardInterrupt:
-            print("\nStopping sensor readings...")
-            break
-        except Exception as e:
-            print(f"Sensor reading error: {e}")
-            error_count += 1
-            blink_led(5, 0.1)  # Five blinks for sensor error
-            
-            # Check for too many consecutive errors
-            if error_count >= MAX_CONSECUTIVE_ERRORS:
-                print(f"Too many consecutive errors ({error_count}), restarting...")
-                machine.reset()
-                
-            time.sleep(READING_INTERVAL)
+            # Sleep until the next scheduled reading, motion timeout or keepalive
+            # ping; a PIR level change ends the sleep early
+            wait_s = READING_INTERVAL - (now - last_sensor_reading)
+            if state.motion_detected and not state.pir_level:
+                wait_s = min(wait_s, PIR_TIMEOUT - (now - state.last_motion_time))
+            wait_s = min(wait_s, mqtt_client.ping_due_in(now))
+            if wait_s > 0:
+                sleep_until_motion(int(wait_s * 1000))
             
         except KeyboardInterrupt:
             print("\nStopping sensor readings...")
             break
         except Exception as e:
             print(f"Sensor reading error: {e}")
+            _discard_published(mqtt_client)
             error_count += 1
             blink_led(5, 0.1)  # Five blinks for sensor error
             
@@ -447,13 +691,24 @@ def main():
                 print(f"Too many consecutive errors ({error_count}), restarting...")
                 machine.reset()
                 
-            time.sleep(READING_INTERVAL)
+            # Keep the broker connection alive through a streak of sensor errors
+            now = time.time()
+            try:
+                mqtt_client.keep_alive(now)
+            except OSError as e:
+                print(f"MQTT keepalive failed: {e}")
+            
+            # Back off with the CPU clock stopped; a PIR level change still ends it
+            backoff_s = min(READING_INTERVAL, max(mqtt_client.ping_due_in(now), 1))
+            sleep_until_motion(int(backoff_s * 1000))
     
     # Cleanup
     try:
+        # A clean disconnect suppresses the last will, so report offline explicitly
+        mqtt_client.publish(STATUS_TOPIC_B, b'{"online":false}', retain=True)
         mqtt_client.disconnect()
-    except:
-        pass
+    except OSError:
+        pass  # Connection already gone
     print("Program ended")
 
 if __name__ == "__main__":
@@ -0,0 +1,10 @@
+# Freeze the SHT-30 driver into a custom MicroPython image for the Pico W.
+# The module's bytecode then runs from flash: no parse at boot and no heap
+# spent holding it. The native/viper functions are compiled by mpy-cross too.
+#
+# Build from a MicroPython checkout:
+#   make -C ports/rp2 BOARD=RPI_PICO_W FROZEN_MANIFEST=/path/to/firmware/pico-sht30/manifest.py
+
+include("$(BOARD_DIR)/manifest.py")
+
+module("sht30.py")
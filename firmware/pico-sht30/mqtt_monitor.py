@@ -6,8 +6,8 @@ Subscribe to temperature and humidity topics and display data
 
 import sys
 import json
+import socket
 import time
-from datetime import datetime
 
 try:
     import paho.mqtt.client as mqtt
@@ -15,6 +15,40 @@ except ImportError:
     print("paho-mqtt not installed. Install with: pip install paho-mqtt")
     sys.exit(1)
 
+# orjson parses the raw payload bytes directly and is much faster; json.loads
+# also accepts bytes, so either way the payload is not decoded first
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+TEMP_PREFIX = "room-temp/"
+HUM_PREFIX = "room-hum/"
+SUBSCRIPTIONS = [(TEMP_PREFIX + "+", 0), (HUM_PREFIX + "+", 0)]
+
+
+def _handle_temp(data, time_str, room, device_id):
+    temp = data['temperature']
+    unit = data.get('unit', '°C')
+    print(f"[{time_str}] Room {room} - Temperature: {temp}{unit} (Device: {device_id})")
+
+
+def _handle_hum(data, time_str, room, device_id):
+    humidity = data['humidity']
+    unit = data.get('unit', '%')
+    print(f"[{time_str}] Room {room} - Humidity: {humidity}{unit} (Device: {device_id})")
+
+
+# Keyed on the first topic level ("room-temp/1" -> "room-temp"); add new
+# sensor types here alongside a SUBSCRIPTIONS entry
+_HANDLERS_BY_PREFIX = {
+    TEMP_PREFIX.rstrip("/"): _handle_temp,
+    HUM_PREFIX.rstrip("/"): _handle_hum,
+}
+
 
 class MQTTMonitor:
     def __init__(self, broker_host, broker_port=1883, username=None, password=None):
@@ -22,7 +56,18 @@ class MQTTMonitor:
         self.broker_port = broker_port
         self.username = username
         self.password = password
-        self.client = mqtt.Client()
+        # Persistent session: the broker keeps our session across
+        # reconnects instead of starting a fresh one each time.
+        # The client id has to be stable for that, but unique per host so
+        # two monitors do not keep kicking each other off the broker.
+        self.client = mqtt.Client(
+            client_id=f"mqtt-monitor-{socket.gethostname()}",
+            clean_session=False,
+        )
+        
+        # Last formatted timestamp; messages from the same second reuse it
+        self._last_ts_int = None
+        self._last_ts_str = ""
         
         # Set up callbacks
         self.client.on_connect = self.on_connect
@@ -36,9 +81,11 @@ class MQTTMonitor:
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             print(f"Connected to MQTT broker at {self.broker_host}:{self.broker_port}")
-            # Subscribe to all room temperature and humidity topics
-            client.subscribe("room-temp/+")
-            client.subscribe("room-hum/+")
+            if flags.get('session present'):
+                print("Resumed existing session")
+            # Always subscribe: a stored session predates any SUBSCRIPTIONS
+            # change, and re-subscribing is idempotent (one packet)
+            client.subscribe(SUBSCRIPTIONS)
             print("Subscribed to topics: room-temp/+, room-hum/+")
         else:
             print(f"Failed to connect to MQTT broker. Return code: {rc}")
@@ -46,10 +93,9 @@ class MQTTMonitor:
     def on_message(self, client, userdata, msg):
         try:
             topic = msg.topic
-            payload = msg.payload.decode('utf-8')
             
             # Parse JSON payload
-            data = json.loads(payload)
+            data = _loads(msg.payload)
             
             # Extract information
             room = data.get('room', 'Unknown')
@@ -58,20 +104,18 @@ class MQTTMonitor:
             device_id = data.get('device_id', 'Unknown')
             
             # Format timestamp
-            dt = datetime.fromtimestamp(timestamp)
-            time_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-            
-            if 'temperature' in data:
-                temp = data['temperature']
-                unit = data.get('unit', '°C')
-                print(f"[{time_str}] Room {room} - Temperature: {temp}{unit} (Device: {device_id})")
+            ts_int = int(timestamp)
+            if ts_int != self._last_ts_int:
+                self._last_ts_str = time.strftime(TIME_FORMAT, time.localtime(ts_int))
+                self._last_ts_int = ts_int
+            time_str = self._last_ts_str
             
-            elif 'humidity' in data:
-                humidity = data['humidity']
-                unit = data.get('unit', '%')
-                print(f"[{time_str}] Room {room} - Humidity: {humidity}{unit} (Device: {device_id})")
+            handler = _HANDLERS_BY_PREFIX.get(topic.split("/", 1)[0])
+            if handler is not None:
+                handler(data, time_str, room, device_id)
             
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            payload = msg.payload.decode('utf-8', 'replace')
             print(f"Invalid JSON received on topic {topic}: {payload}")
         except Exception as e:
             print(f"Error processing message on topic {topic}: {e}")